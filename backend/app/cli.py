@@ -0,0 +1,222 @@
+"""
+Headless batch generation of stock plans and PDFs.
+
+Calls the same services as the API, without the HTTP server:
+
+    python -m app.cli -o out                                # every day, default settings
+    python -m app.cli -o out --days 1-3,5 --settings ni_photoredox.json -j 8
+    python -m app.cli -o out --formats pdf --include-next-day --force
+
+A settings file is JSON, either {"settings": {...}, "other_reagents": [...]}
+(the /api/stocks/plan payload) or just the settings object. Each settings
+file gets its own subdirectory; plate PDFs are shared under plates/.
+
+Outputs are skipped when their inputs (the rows of the day/plate in the
+reactions sheet, chemical/reagent sheets and settings) haven't changed since
+the last run; the hashes are kept in <out>/.manifest.json.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from .services.inventory import inventory, LEDGER_PATH
+from .services.loader import data, DATA_DIR, PlateQuery
+from .services.stocks import stock_plan, DEFAULT_SETTINGS, DEFAULT_OTHER_REAGENTS
+
+MANIFEST = ".manifest.json"
+FORMATS = ("json", "csv", "pdf")
+# Bump when the output layout changes so every output is regenerated once
+OUTPUT_REVISION = 1
+
+def parse_days(spec: str) -> List[int]:
+    days = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        try:
+            a, b = int(lo), int(hi) if sep else int(lo)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Bad day range {part!r} (expected e.g. 1-3,5)")
+        if b < a:
+            raise argparse.ArgumentTypeError(f"Bad day range {part!r}")
+        days.update(range(a, b + 1))
+    return sorted(days)
+
+def load_settings(path: Optional[str]) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
+    if path is None:
+        return "default", dict(DEFAULT_SETTINGS), list(DEFAULT_OTHER_REAGENTS)
+    with open(path, encoding="utf-8") as fh:
+        obj = json.load(fh)
+    name = os.path.splitext(os.path.basename(path))[0]
+    if "settings" in obj:
+        return name, {**DEFAULT_SETTINGS, **obj["settings"]}, obj.get("other_reagents", DEFAULT_OTHER_REAGENTS)
+    return name, {**DEFAULT_SETTINGS, **obj}, list(DEFAULT_OTHER_REAGENTS)
+
+def _file_hash(path: str) -> str:
+    if not os.path.exists(path):
+        return "missing"
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps([OUTPUT_REVISION, *parts], sort_keys=True, default=str).encode()).hexdigest()
+
+def _write(path: str, content: bytes):
+    # Write-then-rename so an interrupted run never leaves a truncated output that looks fresh
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(content)
+    os.replace(tmp, path)
+
+def _grids_csv(plan: Dict[str, Any]) -> bytes:
+    columns: List[str] = []
+    for g in plan["grids"]:
+        columns += [c for c in g["columns"] if c not in columns]
+    lines: List[List[Any]] = [["plate", *columns]]
+    for g in plan["grids"]:
+        for r in g["rows"]:
+            lines.append([g["plate"], *[r.get(c, "") for c in columns]])
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(lines)
+    return buf.getvalue().encode("utf-8")
+
+# --- Worker side -------------------------------------------------------------
+
+def _init_worker():
+    data.load_all()
+    inventory.load()
+
+def _run_plan(day: int, include_next: bool, settings: Dict[str, Any], others: List[Dict[str, Any]], outputs: Dict[str, str]) -> List[str]:
+    plan = stock_plan(day=day, include_next=include_next, settings=settings, other_list=others)
+    if "json" in outputs:
+        _write(outputs["json"], json.dumps(plan, indent=2).encode("utf-8"))
+    if "csv" in outputs:
+        _write(outputs["csv"], _grids_csv(plan))
+    if "pdf" in outputs:
+        from .services.pdf import render_stocks_pdf
+        _write(outputs["pdf"], render_stocks_pdf(settings, others, plan).getvalue())
+    return list(outputs.values())
+
+def _run_plate(day: int, plate: int, path: str) -> List[str]:
+    from .services.pdf import render_plate_pdf
+    grid = data.plate_grid(PlateQuery(day=day, plate_in_day=plate))
+    _write(path, render_plate_pdf(title=f"Day {day} - Plate {plate}", grid=grid).getvalue())
+    return [path]
+
+# --- Planning ----------------------------------------------------------------
+
+def build_tasks(args) -> List[Tuple[str, str, Any, tuple]]:
+    """Returns (manifest key, input hash, function, args) for every output group."""
+    sigs = data.plate_signatures()
+    all_days = sorted({d for d, _ in sigs})
+    days = [d for d in (args.days or all_days) if d in all_days]
+    missing = sorted(set(args.days or []) - set(all_days))
+    if missing:
+        print(f"[cli] No reactions for day(s) {', '.join(map(str, missing))}; skipping")
+
+    sheets = {fn: _file_hash(os.path.join(DATA_DIR, fn)) for fn in ("chemicals.xlsx", "reagents.xlsx")}
+    formats = [f for f in args.formats.split(",") if f]
+    ext = {"json": "plan.json", "csv": "grids.csv", "pdf": "stocks.pdf"}
+    tasks = []
+
+    for path in (args.settings or [None]):
+        name, settings, others = load_settings(path)
+        ledger = _file_hash(LEDGER_PATH) if settings.get("use_inventory") else None
+        for d in days:
+            span = [d, d + 1] if args.include_next_day else [d]
+            rows = sorted((k, v) for k, v in sigs.items() if k[0] in span)
+            suffix = f"day{d}-{d + 1}" if args.include_next_day else f"day{d}"
+            outputs = {f: os.path.join(args.out, name, f"{suffix}_{ext[f]}") for f in formats}
+            key = f"{name}/{suffix}"
+            h = _digest("plan", rows, sheets, ledger, settings, others, sorted(outputs))
+            tasks.append((key, h, _run_plan, (d, args.include_next_day, settings, others, outputs)))
+
+    if "pdf" in formats:
+        for (d, p), sig in sorted(sigs.items()):
+            if d not in days:
+                continue
+            path = os.path.join(args.out, "plates", f"day{d}_plate{p}.pdf")
+            tasks.append((f"plates/day{d}_plate{p}", _digest("plate", sig), _run_plate, (d, p, path)))
+    return tasks
+
+def _outputs_exist(fn, fargs) -> bool:
+    paths = list(fargs[-1].values()) if fn is _run_plan else [fargs[-1]]
+    return all(os.path.exists(p) for p in paths)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m app.cli", description="Batch-generate stock plans and PDFs.")
+    ap.add_argument("-o", "--out", required=True, help="Output directory")
+    ap.add_argument("--days", type=parse_days, help="Days to generate, e.g. 1-3,5 (default: all days in the data)")
+    ap.add_argument("--include-next-day", action="store_true", help="Plan each day together with the next one")
+    ap.add_argument("--settings", action="append", metavar="FILE", help="Settings JSON file; repeat for several settings sets")
+    ap.add_argument("--formats", default=",".join(FORMATS), help="Comma-separated subset of json,csv,pdf (default all)")
+    ap.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    ap.add_argument("--force", action="store_true", help="Regenerate outputs even if their inputs are unchanged")
+    args = ap.parse_args(argv)
+
+    bad = [f for f in args.formats.split(",") if f and f not in FORMATS]
+    if bad:
+        ap.error(f"Unknown format(s): {', '.join(bad)}")
+
+    _init_worker()
+    os.makedirs(args.out, exist_ok=True)
+    manifest_path = os.path.join(args.out, MANIFEST)
+    manifest: Dict[str, str] = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+
+    todo, skipped = [], 0
+    for key, h, fn, fargs in build_tasks(args):
+        if not args.force and manifest.get(key) == h and _outputs_exist(fn, fargs):
+            skipped += 1
+        else:
+            todo.append((key, h, fn, fargs))
+
+    written, failed = 0, 0
+    def done(key, h, paths):
+        nonlocal written
+        manifest[key] = h
+        written += len(paths)
+        for p in paths:
+            print(f"[cli] wrote {os.path.relpath(p, args.out)}")
+
+    def fail(key, e):
+        nonlocal failed
+        manifest.pop(key, None)
+        failed += 1
+        print(f"[cli] {key} failed: {e}")
+
+    if args.workers <= 1 or len(todo) <= 1:
+        for key, h, fn, fargs in todo:
+            try:
+                done(key, h, fn(*fargs))
+            except Exception as e:
+                fail(key, e)
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(todo)), initializer=_init_worker) as pool:
+            futures = {pool.submit(fn, *fargs): (key, h) for key, h, fn, fargs in todo}
+            for fut in as_completed(futures):
+                key, h = futures[fut]
+                try:
+                    done(key, h, fut.result())
+                except Exception as e:
+                    fail(key, e)
+
+    _write(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    print(f"[cli] {written} file(s) written, {skipped} output group(s) unchanged, {failed} failed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
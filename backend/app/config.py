@@ -1,3 +1,8 @@
+import os
 from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / 'data'
+
+# Import RDKit/ReportLab in a background thread right after startup so the
+# first plan/PDF request doesn't pay for it. Set LAB_PREWARM=0 to disable.
+PREWARM = os.environ.get("LAB_PREWARM", "1") != "0"
@@ -1,12 +1,21 @@
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import time
+from datetime import date
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+from .config import PREWARM
+from .services.jobs import jobs, QueueFull
+from .services.inventory import inventory
+from .services.events import broker, format_sse, watch_data
 from .services.loader import data, PlateQuery
 from .services.pdf import render_plate_pdf, render_stocks_pdf
 from .services.stocks import stock_plan
+from .services.warmup import start_prewarm
 
 app = FastAPI(title="Lab Plate & Stock Assistant")
 
@@ -34,9 +43,61 @@ class StocksPayload(BaseModel):
     settings: Dict[str, Any]
     other_reagents: List[Dict[str, Any]]
 
+class InventoryStockPayload(BaseModel):
+    name: str
+    conc_M: float
+    volume_mL: float
+    prepared: Optional[date] = None  # defaults to today
+
+class JobPayload(BaseModel):
+    kind: str  # stocks_plan | stocks_pdf | plate_pdf
+    payload: Dict[str, Any]
+
+JOB_PAYLOADS = {
+    "stocks_plan": StocksPayload,
+    "stocks_pdf": StocksPayload,
+    "plate_pdf": PlatePdfPayload,
+}
+
+_watcher: Optional[asyncio.Task] = None
+
 @app.on_event("startup")
 def _startup():
+    t0 = time.perf_counter()
     data.load_all()
+    inventory.load()
+    print(f"[startup] Data loaded in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    if PREWARM:
+        start_prewarm()
+
+@app.on_event("startup")
+async def _start_events():
+    global _watcher
+    broker.bind(asyncio.get_running_loop())
+    _watcher = asyncio.create_task(watch_data())
+
+@app.on_event("startup")
+async def _start_jobs():
+    await jobs.start()
+
+@app.on_event("shutdown")
+async def _stop_events():
+    if _watcher is not None:
+        _watcher.cancel()
+
+@app.on_event("shutdown")
+async def _stop_jobs():
+    await jobs.stop()
+
+@app.get("/api/events")
+async def get_events(request: Request):
+    # First message carries the current data version; clients compare it on
+    # (re)connect and refetch everything if they missed changes.
+    hello = format_sse("hello", {"version": data.version}, id=data.version)
+    return StreamingResponse(broker.stream(request, hello), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
 
 @app.get("/api/plate")
 def get_plate(day: int = 1, plate: int = 1):
@@ -59,6 +120,8 @@ def post_stocks_plan(payload: StocksPayload):
     try:
         out = stock_plan(day=payload.day, include_next=payload.include_next_day, settings=payload.settings, other_list=payload.other_reagents)
         return out
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -70,5 +133,89 @@ def post_stocks_pdf(payload: StocksPayload):
         return StreamingResponse(buf, media_type="application/pdf", headers={
             "Content-Disposition": 'attachment; filename="stocks.pdf"'
         })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/inventory")
+def get_inventory(name: Optional[str] = None):
+    return {"remaining": inventory.summary(), "lots": inventory.lots(name)}
+
+@app.post("/api/inventory/stocks")
+def post_inventory_stock(payload: InventoryStockPayload):
+    try:
+        return inventory.prepare(payload.name, payload.conc_M, payload.volume_mL, payload.prepared)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/inventory/commit")
+def post_inventory_commit(payload: StocksPayload):
+    try:
+        settings = {**payload.settings, "use_inventory": True}
+        days = f"{payload.day}-{payload.day + 1}" if payload.include_next_day else str(payload.day)
+        return inventory.commit_plan(
+            lambda: stock_plan(day=payload.day, include_next=payload.include_next_day, settings=settings, other_list=payload.other_reagents),
+            ref=f"day {days}",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/jobs", status_code=202)
+async def post_job(job: JobPayload):
+    model = JOB_PAYLOADS.get(job.kind)
+    if model is None:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{job.kind}' (choose from {', '.join(JOB_PAYLOADS)})")
+    try:
+        payload = jsonable_encoder(model(**job.payload))
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        return await jobs.submit(job.kind, payload)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+# Plain def: the store calls block, so these run in the threadpool, not on the loop
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    content, media_type = jobs.store.result(job_id)
+    headers = {}
+    if media_type == "application/pdf":
+        name = "plate.pdf" if job["kind"] == "plate_pdf" else "stocks.pdf"
+        headers["Content-Disposition"] = f'attachment; filename="{name}"'
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@app.get("/api/chemicals/similar")
+def get_similar_chemicals(id: str, k: int = 10, type: Optional[str] = None):
+    t0 = time.perf_counter()
+    try:
+        index = data.fingerprint_index()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    row = index.row_of(id, type)
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Unknown chemical '{id}'" + (f" of type '{type}'" if type else ""))
+    if not index.valid[row]:
+        raise HTTPException(status_code=422, detail=f"No usable SMILES for '{id}'")
+    results = index.similar(row, k=max(1, min(k, 500)), kind=type)
+    return {
+        "query": {"id": str(index.ids[row]), "type": str(index.types[row]), "smiles": str(index.smiles[row])},
+        "results": results,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+    }
@@ -0,0 +1,91 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from .loader import data
+
+HEARTBEAT_S = 15.0    # keep-alive comment so proxies don't drop idle streams
+DATA_POLL_S = 2.0     # how often the Excel sources are checked for changes
+QUEUE_SIZE = 32       # per-client backlog before old events are dropped
+
+def format_sse(event: str, payload: Dict[str, Any], id: Optional[int] = None) -> str:
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(payload, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+class EventBroker:
+    """
+    Fans server-sent events out to every connected client.
+
+    Each subscriber owns a small asyncio.Queue, so an idle client costs one
+    suspended coroutine and no thread. `publish` is thread-safe: the sync
+    endpoints run in the threadpool and hand messages over to the loop.
+    """
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, payload: Dict[str, Any], id: Optional[int] = None):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        msg = format_sse(event, payload, id=id)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fanout(msg)
+        else:
+            loop.call_soon_threadsafe(self._fanout, msg)
+
+    def _fanout(self, msg: str):
+        for q in list(self._subscribers):
+            try:
+                q.put_nowait(msg)
+            except asyncio.QueueFull:
+                # Slow client: drop its oldest event. The gap shows up as a
+                # version jump, which tells the client to refetch everything.
+                q.get_nowait()
+                q.put_nowait(msg)
+
+    async def stream(self, request, hello: str) -> AsyncIterator[str]:
+        q: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.add(q)
+        try:
+            yield hello
+            while True:
+                try:
+                    msg = await asyncio.wait_for(q.get(), timeout=HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield msg
+        finally:
+            self._subscribers.discard(q)
+
+broker = EventBroker()
+
+async def watch_data(interval: float = DATA_POLL_S):
+    """Poll the data sources and push a `data` event whenever they change."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            change = await asyncio.to_thread(data.reload_if_changed)
+        except Exception as e:
+            print(f"[events] Reload failed: {e}")
+            continue
+        if change:
+            broker.publish("data", change, id=change["version"])
@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+import uuid
+from dataclasses import dataclass, asdict
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+from .loader import DATA_DIR
+
+LEDGER_PATH = os.path.join(DATA_DIR, "inventory.jsonl")
+
+def _key(name: str) -> str:
+    return (name or "").strip()
+
+def _conc_key(conc_M: float) -> float:
+    # Stocks are matched on concentration too; round away float noise from the UI
+    return round(float(conc_M), 6)
+
+@dataclass
+class Lot:
+    lot_id: str
+    name: str
+    conc_M: float
+    volume_mL: float
+    remaining_mL: float
+    prepared: str  # ISO date
+
+class Inventory:
+    """
+    Ledger of stock solutions on the bench.
+
+    The ledger is an append-only JSONL file (one `prepare` or `debit` entry per
+    line) replayed into memory at startup. Remaining volume is kept in a
+    name -> concentration -> mL index, so lookups during planning are O(1)
+    regardless of how long the history is. Debits consume lots oldest first.
+    """
+    def __init__(self, path: str = LEDGER_PATH):
+        self.path = path
+        # Re-entrant so commit_plan can hold it across prepare/debit calls
+        self._lock = threading.RLock()
+        self._lots: Dict[str, Dict[float, List[Lot]]] = {}
+        self._remaining: Dict[str, Dict[float, float]] = {}
+
+    def load(self):
+        with self._lock:
+            self._lots, self._remaining = {}, {}
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, encoding="utf-8") as fh:
+                for n, line in enumerate(fh, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        self._apply(json.loads(line))
+                    except Exception as e:
+                        print(f"[inventory] Skipping bad ledger line {n}: {e}")
+
+    def remaining_mL(self, name: str, conc_M: Optional[float] = None) -> float:
+        with self._lock:
+            by_conc = self._remaining.get(_key(name))
+            if not by_conc:
+                return 0.0
+            if conc_M is None:
+                return sum(by_conc.values())
+            return by_conc.get(_conc_key(conc_M), 0.0)
+
+    def lots(self, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Under the lock: a concurrent prepare/debit may add keys or pop lots
+        with self._lock:
+            names = [_key(name)] if name is not None else sorted(self._lots)
+            out = []
+            for nm in names:
+                for lots in self._lots.get(nm, {}).values():
+                    out.extend(asdict(l) for l in lots)
+            return out
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                nm: {str(c): round(v, 4) for c, v in by_conc.items() if v > 0}
+                for nm, by_conc in sorted(self._remaining.items())
+                if any(v > 0 for v in by_conc.values())
+            }
+
+    def prepare(self, name: str, conc_M: float, volume_mL: float, prepared: Optional[date] = None) -> Dict[str, Any]:
+        if not _key(name):
+            raise ValueError("Stock name is required")
+        if float(conc_M) <= 0 or float(volume_mL) <= 0:
+            raise ValueError("Concentration and volume must be positive")
+        entry = {
+            "op": "prepare",
+            "lot": uuid.uuid4().hex[:12],
+            "name": _key(name),
+            "conc_M": float(conc_M),
+            "volume_mL": float(volume_mL),
+            "prepared": (prepared or date.today()).isoformat(),
+        }
+        self._record(entry)
+        return asdict(self._lots[entry["name"]][_conc_key(conc_M)][-1])
+
+    def debit(self, name: str, conc_M: float, volume_mL: float, ref: Optional[str] = None) -> float:
+        """Debit up to `volume_mL`; returns the volume actually taken from stock."""
+        if float(volume_mL) <= 0:
+            return 0.0
+        entry = {"op": "debit", "name": _key(name), "conc_M": float(conc_M), "volume_mL": float(volume_mL)}
+        if ref:
+            entry["ref"] = ref
+        with self._lock:
+            taken = min(float(volume_mL), self.remaining_mL(name, conc_M))
+            self._append(entry)
+            self._apply(entry)
+        return taken
+
+    def commit_plan(self, make_plan: Callable[[], Dict[str, Any]], ref: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build a plan with `make_plan` and record it as carried out: stocks the
+        plan says to prepare or top up are added to the ledger, then every
+        stock is debited by what the wells consume. Volume the bench couldn't
+        cover is reported under `shortfalls`. Mixed stocks are not tracked.
+
+        The lock is held from planning to the last ledger entry, so two
+        concurrent commits can't both plan against the same bench stock.
+        """
+        with self._lock:
+            plan = make_plan()
+            prepared, debited, shortfalls = [], [], []
+            for kind in ("aryl", "alkyl", "others"):
+                for row in plan["totals"][kind]:
+                    name, conc = row["id_or_name"], row["stock_M"]
+                    if not conc:
+                        continue
+                    if row.get("action") in ("prepare", "top_up") and row.get("total_volume_mL"):
+                        prepared.append(self.prepare(name, conc, row["total_volume_mL"]))
+                    need = row.get("needed_mL") or 0.0
+                    if need > 0:
+                        taken = self.debit(name, conc, need, ref=ref)
+                        debited.append({"name": name, "conc_M": conc, "volume_mL": round(taken, 4)})
+                        if need - taken > 1e-9:
+                            shortfalls.append({"name": name, "conc_M": conc, "volume_mL": round(need - taken, 4)})
+            return {"prepared": prepared, "debited": debited, "shortfalls": shortfalls}
+
+    def _record(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._append(entry)
+            self._apply(entry)
+
+    def _append(self, entry: Dict[str, Any]):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry) + "\n")
+
+    def _apply(self, entry: Dict[str, Any]):
+        nm, ck = _key(entry["name"]), _conc_key(entry["conc_M"])
+        lots = self._lots.setdefault(nm, {}).setdefault(ck, [])
+        by_conc = self._remaining.setdefault(nm, {})
+        if entry["op"] == "prepare":
+            vol = float(entry["volume_mL"])
+            lots.append(Lot(lot_id=entry["lot"], name=nm, conc_M=float(entry["conc_M"]),
+                            volume_mL=vol, remaining_mL=vol, prepared=entry["prepared"]))
+            by_conc[ck] = by_conc.get(ck, 0.0) + vol
+        elif entry["op"] == "debit":
+            left = float(entry["volume_mL"])
+            while left > 1e-12 and lots:
+                take = min(left, lots[0].remaining_mL)
+                lots[0].remaining_mL -= take
+                left -= take
+                if lots[0].remaining_mL <= 1e-12:
+                    lots.pop(0)
+            by_conc[ck] = sum(l.remaining_mL for l in lots)
+        else:
+            raise ValueError(f"Unknown ledger op {entry['op']!r}")
+
+inventory = Inventory()
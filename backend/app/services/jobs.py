@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .events import broker
+from .loader import DATA_DIR
+
+JOBS_DB = os.path.join(DATA_DIR, "jobs.sqlite3")
+JOB_WORKERS = 2          # jobs running at once
+MAX_PENDING = 100        # queued jobs before new submissions are refused
+RETENTION_S = 7 * 86400  # finished jobs (and their results) are purged after this
+PURGE_EVERY_S = 3600     # how often a worker checks for expired jobs
+
+ACTIVE = ("queued", "running")
+
+class QueueFull(Exception):
+    pass
+
+class JobStore:
+    """
+    SQLite-backed job table: status, progress, payload and the finished result.
+    One connection shared by the loop and the worker threads, guarded by a lock.
+    """
+    def __init__(self, path: str = JOBS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    payload TEXT NOT NULL,
+                    result BLOB,
+                    media_type TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs(key, status)")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _query(self, sql: str, args: tuple = ()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def create(self, kind: str, key: str, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._query(
+            "INSERT INTO jobs (id, kind, key, status, payload, created, updated) VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, key, json.dumps(payload), now, now),
+        )
+        return job_id
+
+    def find_active(self, key: str) -> Optional[str]:
+        rows = self._query("SELECT id FROM jobs WHERE key = ? AND status IN (?, ?) ORDER BY created LIMIT 1", (key, *ACTIVE))
+        return rows[0][0] if rows else None
+
+    def update(self, job_id: str, **fields):
+        fields["updated"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self._query(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT id, kind, status, progress, error, created, updated, media_type FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        r = rows[0]
+        return {"id": r[0], "kind": r[1], "status": r[2], "progress": round(r[3], 3), "error": r[4],
+                "created": r[5], "updated": r[6], "media_type": r[7]}
+
+    def payload(self, job_id: str) -> Tuple[str, Dict[str, Any]]:
+        kind, payload = self._query("SELECT kind, payload FROM jobs WHERE id = ?", (job_id,))[0]
+        return kind, json.loads(payload)
+
+    def result(self, job_id: str) -> Tuple[bytes, str]:
+        content, media_type = self._query("SELECT result, media_type FROM jobs WHERE id = ?", (job_id,))[0]
+        return content, media_type
+
+    def unfinished(self):
+        return [r[0] for r in self._query("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", ACTIVE)]
+
+    def purge(self, older_than_s: float):
+        self._query("DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated < ?", (*ACTIVE, time.time() - older_than_s))
+
+# --- Job bodies (run in a worker thread) --------------------------------------
+
+def _run_stocks_plan(payload, progress):
+    from .stocks import stock_plan
+    plan = stock_plan(day=payload["day"], include_next=payload["include_next_day"],
+                      settings=payload["settings"], other_list=payload["other_reagents"])
+    return json.dumps(plan).encode("utf-8"), "application/json"
+
+def _run_stocks_pdf(payload, progress):
+    from .pdf import render_stocks_pdf
+    from .stocks import stock_plan
+    plan = stock_plan(day=payload["day"], include_next=payload["include_next_day"],
+                      settings=payload["settings"], other_list=payload["other_reagents"])
+    progress(0.5)
+    buf = render_stocks_pdf(payload["settings"], payload["other_reagents"], plan)
+    return buf.getvalue(), "application/pdf"
+
+def _run_plate_pdf(payload, progress):
+    from .pdf import render_plate_pdf
+    buf = render_plate_pdf(title=payload["title"], grid=payload["grid"])
+    return buf.getvalue(), "application/pdf"
+
+RUNNERS: Dict[str, Callable] = {
+    "stocks_plan": _run_stocks_plan,
+    "stocks_pdf": _run_stocks_pdf,
+    "plate_pdf": _run_plate_pdf,
+}
+
+def job_key(kind: str, payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps([kind, payload], sort_keys=True).encode("utf-8")).hexdigest()
+
+class JobQueue:
+    """
+    In-process job runner for plans and PDFs that are too slow for a request.
+
+    Submissions go into an asyncio queue drained by JOB_WORKERS workers; each
+    job body runs in a thread so the event loop stays free. Identical
+    submissions (same kind and payload) share one job while it is queued or
+    running. Jobs and results live in SQLite, so unfinished jobs are picked
+    up again after a restart.
+    """
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._submit_lock: Optional[asyncio.Lock] = None
+        self._tasks = []
+        self._last_purge = 0.0
+
+    async def start(self):
+        await asyncio.to_thread(self.store.open)
+        await asyncio.to_thread(self._purge)
+        self._queue = asyncio.Queue()
+        self._submit_lock = asyncio.Lock()
+        for job_id in await asyncio.to_thread(self.store.unfinished):
+            await asyncio.to_thread(self.store.update, job_id, status="queued", progress=0.0)
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.store.close)
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        # Every store call runs in a thread: SQLite may block (large BLOBs,
+        # "database is locked") and must not stall the loop or SSE streams.
+        if kind not in RUNNERS:
+            raise ValueError(f"Unknown job kind {kind!r} (choose from {', '.join(RUNNERS)})")
+        key = job_key(kind, payload)
+        # Lookup and insert must not interleave with another submission, or
+        # two identical jobs could both miss find_active
+        async with self._submit_lock:
+            existing = await asyncio.to_thread(self.store.find_active, key)
+            if existing:
+                return {**await asyncio.to_thread(self.store.get, existing), "deduplicated": True}
+            if self._queue.qsize() >= MAX_PENDING:
+                raise QueueFull(f"{MAX_PENDING} jobs already queued; try again later")
+            job_id = await asyncio.to_thread(self.store.create, kind, key, payload)
+        self._queue.put_nowait(job_id)
+        job = await asyncio.to_thread(self._notify, job_id)
+        return {**job, "deduplicated": False}
+
+    def _purge(self):
+        try:
+            self.store.purge(RETENTION_S)
+        except Exception as e:
+            print(f"[jobs] Purge failed: {e}")
+        self._last_purge = time.monotonic()
+
+    async def _worker(self):
+        while True:
+            try:
+                job_id = await asyncio.wait_for(self._queue.get(), timeout=PURGE_EVERY_S)
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self._purge)  # idle: still drop expired results
+                continue
+            try:
+                await asyncio.to_thread(self._run, job_id)
+            except Exception as e:
+                # Store errors (e.g. "database is locked") must not kill the worker
+                print(f"[jobs] Job {job_id} failed: {e}")
+                try:
+                    await asyncio.to_thread(self._fail, job_id, str(e))
+                except Exception as e2:
+                    print(f"[jobs] Could not mark job {job_id} failed: {e2}")
+            finally:
+                self._queue.task_done()
+            if time.monotonic() - self._last_purge >= PURGE_EVERY_S:
+                await asyncio.to_thread(self._purge)
+
+    def _run(self, job_id: str):
+        # Runs in a thread, store writes (including the result BLOB) included
+        kind, payload = self.store.payload(job_id)
+        self.store.update(job_id, status="running", progress=0.05)
+        self._notify(job_id)
+
+        def progress(frac: float):
+            self.store.update(job_id, progress=max(0.0, min(1.0, frac)))
+            self._notify(job_id)
+
+        try:
+            content, media_type = RUNNERS[kind](payload, progress)
+        except Exception as e:
+            self._fail(job_id, str(e))
+            return
+        self.store.update(job_id, status="done", progress=1.0, result=content, media_type=media_type)
+        self._notify(job_id)
+
+    def _fail(self, job_id: str, error: str):
+        self.store.update(job_id, status="failed", error=error)
+        self._notify(job_id)
+
+    def _notify(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job:
+            broker.publish("job", {k: job[k] for k in ("id", "kind", "status", "progress")})
+        return job
+
+jobs = JobQueue(JobStore())
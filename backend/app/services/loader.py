@@ -1,10 +1,13 @@
 import os
+import threading
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 BASE = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(os.path.dirname(BASE), "data")
+DATA_FILES = ("reactions.xlsx", "chemicals.xlsx", "reagents.xlsx")
 
 def _col(df, name, alts):
     cols = {c.lower(): c for c in df.columns}
@@ -83,6 +86,73 @@ def _normalize_chemicals(df: pd.DataFrame) -> pd.DataFrame:
     print("[chemicals.xlsx] Warning: could not normalize; expected columns not found.")
     return df.copy()
 
+WELL_ROWS = {"A": 0, "B": 1, "C": 2, "D": 3}
+
+def _compact_reactions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink the reactions table, which is most of the backend's memory on big
+    campaigns:
+      Aryl-ID / Alkyl-ID / well -> categoricals (one shared string per ID)
+      well                      -> also packed int8 `well_row` / `well_col`
+      day / plate               -> smallest integer dtype that fits
+      is_control                -> bool
+      any other text column     -> categorical
+      any other numeric column  -> smallest integer dtype (nullable if it has
+                                   gaps), or float32 for fractional values
+    Values of the columns we read are stripped (and wells upper-cased).
+    """
+    if df is None or df.empty:
+        return df
+    out = df.copy()
+    c_day = _col(out, "day_number", ["day number", "day"])
+    c_plate = _col(out, "plate_in_day", ["plate in day", "plate"])
+    c_well = _col(out, "well", ["well position", "well_position", "pos"])
+    c_ctrl = _col(out, "is_control", ["control", "is control"])
+    c_aryl = _col(out, "Aryl-ID", ["aryl-id", "aryl_id", "aryl"])
+    c_alk = _col(out, "Alkyl-ID", ["alkyl-id", "alkyl_id", "alkyl"])
+
+    for c in (c_day, c_plate):
+        if c:
+            out[c] = pd.to_numeric(out[c], downcast="integer")
+    if c_ctrl:
+        out[c_ctrl] = out[c_ctrl].fillna(False).astype(bool)
+    for c in (c_aryl, c_alk):
+        if c:
+            s = out[c]
+            out[c] = s.where(s.isna(), s.astype(str).str.strip()).astype("category")
+    if c_well:
+        w = out[c_well].astype(str).str.strip().str.upper()
+        out[c_well] = w.astype("category")
+        out["well_row"] = w.str[:1].map(WELL_ROWS).fillna(0).astype("int8")
+        out["well_col"] = (pd.to_numeric(w.str[1:], errors="coerce") - 1).fillna(0).astype("int8")
+
+    # Columns nothing reads yet (e.g. Aryl_cpp_ID, plate_number, pair_number)
+    handled = {c_day, c_plate, c_well, c_ctrl, c_aryl, c_alk, "well_row", "well_col"}
+    for c in out.columns:
+        if c in handled:
+            continue
+        s = out[c]
+        if s.dtype == object:
+            out[c] = s.astype("category")
+        elif pd.api.types.is_bool_dtype(s):
+            continue
+        elif pd.api.types.is_integer_dtype(s):
+            out[c] = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s):
+            out[c] = _narrow_float(s)
+    return out
+
+def _narrow_float(s: pd.Series) -> pd.Series:
+    # Whole numbers stored as float only because of NaN gaps -> nullable ints
+    vals = s.dropna()
+    if vals.empty or not (vals == vals.round()).all():
+        return pd.to_numeric(s, downcast="float")
+    lo, hi = vals.min(), vals.max()
+    for dtype, info in (("Int8", np.iinfo(np.int8)), ("Int16", np.iinfo(np.int16)), ("Int32", np.iinfo(np.int32))):
+        if info.min <= lo and hi <= info.max:
+            return s.astype(dtype)
+    return s.astype("Int64")
+
 @dataclass
 class PlateQuery:
     day: int
@@ -94,34 +164,143 @@ class Data:
         self.df_chems: Optional[pd.DataFrame] = None
         self.df_reagents: Optional[pd.DataFrame] = None
 
+        # Bumped on every (re)load so clients can tell whether their copy is stale
+        self.version = 0
+        self.source_mtimes: Dict[str, Optional[float]] = {}
+        self._failed_mtimes: Optional[Dict[str, Optional[float]]] = None
+        self.reac_memory: Dict[str, int] = {}
+
+        self._fp_index = None
+        self._fp_version = None
+        self._fp_lock = threading.Lock()
+
         self.overrides_mw = {"Ir Cat": 1121.91}
         self.overrides_smiles = {
             "TTMSS": "C[Si](C)(C)[SiH]([Si](C)(C)C)[Si](C)(C)C",
             "AL-CONTROL": "O=C(OC(C)(C)C)N1CC(Br)C1",
         }
 
-    def load_all(self):
-        self.df_reac = self._load_excel(os.path.join(DATA_DIR, "reactions.xlsx"))
-        self.df_chems = self._load_excel(os.path.join(DATA_DIR, "chemicals.xlsx"))
-        self.df_reagents = self._load_excel(os.path.join(DATA_DIR, "reagents.xlsx"))
+    def load_all(self, reload: bool = False) -> bool:
+        """
+        Read the Excel sources and swap them in. Missing sheets fall back to
+        the demo data at first load only.
+
+        On a reload, a sheet that is missing or fails to read (e.g. caught
+        halfway through a save) aborts the whole reload: the current tables
+        and source_mtimes are kept so the next poll retries. Returns whether
+        the tables were replaced.
+        """
+        mtimes = self._source_mtimes()
+        # Log a failing reload once per on-disk state, not on every poll
+        quiet = reload and mtimes == self._failed_mtimes
+        current = {"reactions.xlsx": self.df_reac, "chemicals.xlsx": self.df_chems, "reagents.xlsx": self.df_reagents}
+        frames = {}
+        for fn in DATA_FILES:
+            if reload and mtimes[fn] is None and self.source_mtimes.get(fn) is None:
+                continue  # still missing, keep what the first load used
+            path = os.path.join(DATA_DIR, fn)
+            frames[fn] = self._load_excel(path, log=not quiet)
+            if frames[fn] is None and reload:
+                if not quiet:
+                    print(f"[loader] Keeping current data; {fn} is missing or unreadable, will retry")
+                self._failed_mtimes = mtimes
+                return False
+        self._failed_mtimes = None
+        df_reac, df_chems, df_reagents = (frames.get(fn) for fn in DATA_FILES)
 
         # 🔧 Normalize chemicals.xlsx to (ID, Type, SMILES)
-        if self.df_chems is not None:
-            self.df_chems = _normalize_chemicals(self.df_chems)
+        if df_chems is not None:
+            df_chems = _normalize_chemicals(df_chems)
 
-        if self.df_reac is None:
-            self.df_reac = self._demo_reactions()
-        if self.df_chems is None:
-            self.df_chems = self._demo_chemicals()
-        if self.df_reagents is None:
-            self.df_reagents = self._demo_reagents()
+        # Sheets skipped on reload keep their current (already prepared) table
+        if "chemicals.xlsx" not in frames:
+            df_chems = current["chemicals.xlsx"]
+        if "reagents.xlsx" not in frames:
+            df_reagents = current["reagents.xlsx"]
+        reuse_reac = "reactions.xlsx" not in frames
+        if reuse_reac:
+            df_reac = current["reactions.xlsx"]
+
+        if df_reac is None:
+            df_reac = self._demo_reactions()
+        if df_chems is None:
+            df_chems = self._demo_chemicals()
+        if df_reagents is None:
+            df_reagents = self._demo_reagents()
+
+        if not reuse_reac:
+            before = int(df_reac.memory_usage(deep=True).sum())
+            df_reac = _compact_reactions(df_reac)
+            after = int(df_reac.memory_usage(deep=True).sum())
+            self.reac_memory = {"rows": int(df_reac.shape[0]), "before_bytes": before, "after_bytes": after}
+            print(f"[loader] reactions: {df_reac.shape[0]} rows, {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB in memory")
 
-    def _load_excel(self, path) -> Optional[pd.DataFrame]:
+        # Swap all tables at once so concurrent readers never mix old and new sheets
+        self.df_reac, self.df_chems, self.df_reagents = df_reac, df_chems, df_reagents
+        self.source_mtimes = mtimes
+        self.version += 1
+        return True
+
+    def _source_mtimes(self) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {}
+        for fn in DATA_FILES:
+            path = os.path.join(DATA_DIR, fn)
+            out[fn] = os.path.getmtime(path) if os.path.exists(path) else None
+        return out
+
+    def plate_signatures(self) -> Dict[Tuple[int, int], int]:
+        """
+        Content hash per (day, plate) of the reactions table, used to work out
+        which plates actually changed between two loads.
+        """
+        df = self.df_reac
+        if df is None or df.empty:
+            return {}
+        c_day = _col(df, "day_number", ["day number", "day"])
+        c_plate = _col(df, "plate_in_day", ["plate in day", "plate"])
+        if not c_day or not c_plate:
+            return {}
+        hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+        sums = hashes.groupby([df[c_day], df[c_plate]]).sum()
+        return {(int(d), int(p)): int(h) for (d, p), h in sums.items()}
+
+    def reload_if_changed(self) -> Optional[Dict[str, Any]]:
+        """
+        Reload the Excel sources if any of them changed on disk.
+
+        Returns None when nothing changed, otherwise a change summary:
+          version | sources (changed files) | days | plates [{day, plate}]
+        Chemical/reagent edits change MWs, so they mark every day as affected
+        (plans change) without touching any plate layout.
+        """
+        mtimes = self._source_mtimes()
+        if mtimes == self.source_mtimes:
+            return None
+        sources = sorted(fn for fn in mtimes if mtimes[fn] != self.source_mtimes.get(fn))
+
+        before = self.plate_signatures()
+        if not self.load_all(reload=True):
+            return None
+        after = self.plate_signatures()
+
+        plates = sorted(k for k in before.keys() | after.keys() if before.get(k) != after.get(k))
+        days = {d for d, _ in plates}
+        if "chemicals.xlsx" in sources or "reagents.xlsx" in sources:
+            days |= {d for d, _ in after}
+        return {
+            "version": self.version,
+            "sources": sources,
+            "days": sorted(days),
+            "plates": [{"day": d, "plate": p} for d, p in plates],
+        }
+
+    def _load_excel(self, path, log: bool = True) -> Optional[pd.DataFrame]:
         try:
             if os.path.exists(path):
                 return pd.read_excel(path)
         except Exception as e:
-            print(f"[loader] Failed to read {path}: {e}")
+            if log:
+                print(f"[loader] Failed to read {path}: {e}")
             return None
         return None
 
@@ -172,6 +351,28 @@ class Data:
                 return str(r.iloc[0][c_sm])
         return None
 
+    def fingerprint_index(self):
+        """
+        Morgan fingerprint index over df_chems, built on first use (and again
+        after a reload) from the on-disk cache or, if the chemicals changed,
+        computed in parallel. Raises RuntimeError without RDKit.
+        """
+        from .similarity import FingerprintIndex
+        with self._fp_lock:
+            if self._fp_index is None or self._fp_version != self.version:
+                df = self.df_chems
+                c_id = _col(df, "ID", ["id", "cpp_id", "aryl-id", "aryl_id"])
+                c_sm = _col(df, "SMILES", ["smiles"])
+                c_kind = _col(df, "Type", ["type", "class", "category"])
+                if not (c_id and c_sm):
+                    raise RuntimeError("chemicals.xlsx has no ID/SMILES columns")
+                ids = df[c_id].astype(str).str.strip().tolist()
+                smiles = df[c_sm].astype(str).str.strip().tolist()
+                kinds = df[c_kind].astype(str).str.strip().str.lower().tolist() if c_kind else [""] * len(ids)
+                self._fp_index = FingerprintIndex.load_or_build(ids, kinds, smiles)
+                self._fp_version = self.version
+            return self._fp_index
+
     def mw_override_for_reagent(self, name: str):
         return self.overrides_mw.get(name)
 
@@ -179,30 +380,21 @@ class Data:
         df = self.df_reac
         c_day = _col(df, "day_number", ["day number", "day"])
         c_plate = _col(df, "plate_in_day", ["plate in day", "plate"])
-        c_well = _col(df, "well", ["well position", "well_position", "pos"])
         c_ctrl = _col(df, "is_control", ["control", "is control"])
         c_aryl = _col(df, "Aryl-ID", ["aryl-id", "aryl_id", "aryl"])
         c_alk = _col(df, "Alkyl-ID", ["alkyl-id", "alkyl_id", "alkyl"])
 
-        sub = df[(df[c_day] == q.day) & (df[c_plate] == q.plate_in_day)].copy()
+        sub = df[(df[c_day] == q.day) & (df[c_plate] == q.plate_in_day)]
+        ctrl = sub[c_ctrl].tolist() if c_ctrl else [False] * len(sub)
+        a = sub[c_aryl].astype(str) if c_aryl else pd.Series("", index=sub.index)
+        l = sub[c_alk].astype(str) if c_alk else pd.Series("", index=sub.index)
+        labels = (a + "/" + l).str.strip(" /").tolist()
         cells = []
-        rows = {"A": 0, "B": 1, "C": 2, "D": 3}
-        for _, r in sub.iterrows():
-            well = str(r[c_well]).strip().upper()
-            row = rows.get(well[:1], 0)
-            try:
-                col = int(well[1:]) - 1
-            except Exception:
-                col = 0
-            if c_ctrl and bool(r[c_ctrl]):
-                label = "CONTROL"
-                control = True
+        for row, col, is_ctrl, label in zip(sub["well_row"].tolist(), sub["well_col"].tolist(), ctrl, labels):
+            if is_ctrl:
+                cells.append({"r": row, "c": col, "label": "CONTROL", "control": True})
             else:
-                a = str(r[c_aryl]) if c_aryl else ""
-                l = str(r[c_alk]) if c_alk else ""
-                label = f"{a}/{l}".strip(" /")
-                control = False
-            cells.append({"r": row, "c": col, "label": label, "control": control})
+                cells.append({"r": row, "c": col, "label": label, "control": False})
         return {"rows": 4, "cols": 6, "cells": cells}
 
     def _demo_reactions(self):
@@ -1,13 +1,28 @@
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import Table, TableStyle, SimpleDocTemplate, Paragraph, Spacer
 from io import BytesIO
 from typing import Dict, Any, List
 
+# ReportLab is imported inside the renderers so that importing this module
+# (and app.main) doesn't pay for it; see warm() for pre-loading it.
+_styles = None
+
+def _stylesheet():
+    global _styles
+    if _styles is None:
+        from reportlab.lib.styles import getSampleStyleSheet
+        _styles = getSampleStyleSheet()
+    return _styles
+
+def warm():
+    import reportlab.pdfgen.canvas  # noqa: F401
+    import reportlab.platypus  # noqa: F401
+    _stylesheet()
+
 def render_plate_pdf(title: str, grid: Dict[str, Any]):
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib import colors
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import mm
+
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=landscape(A4))
     width, height = landscape(A4)
@@ -74,21 +89,31 @@ def render_plate_pdf(title: str, grid: Dict[str, Any]):
     return buf
 
 def render_stocks_pdf(settings, others, plan):
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib import colors
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Table, TableStyle, SimpleDocTemplate, Paragraph, Spacer
+
     buf = BytesIO()
     doc = SimpleDocTemplate(buf, pagesize=landscape(A4), leftMargin=15*mm, rightMargin=15*mm, topMargin=12*mm, bottomMargin=12*mm)
-    styles = getSampleStyleSheet()
+    styles = _stylesheet()
     elems = []
 
-    title_text = "Stock solutions plan (basis: {:.6f} mmol/well; fixed 0.8 mL stocks)".format(float(settings.get("mmol_limitant_per_well", 0.0005)))
+    # With bench inventory the prep volume varies per stock (fresh stocks cover the need, top-ups, skips)
+    vol_text = "stock volumes per 'Total mL' column" if settings.get("use_inventory") else "fixed 0.8 mL stocks"
+    title_text = "Stock solutions plan (basis: {:.6f} mmol/well; {})".format(float(settings.get("mmol_limitant_per_well", 0.0005)), vol_text)
     title = Paragraph(title_text, styles["Title"])
     elems.append(title)
     elems.append(Spacer(1, 6))
 
     def table_from_rows(title, rows):
-        data = [["ID/Name","MW","Uses","eq","Stock M","µL/well","Total mg (for 0.8 mL)","Total mL"]]
+        with_inv = any(r.get("on_hand_mL") is not None for r in rows)
+        mass_header = "Total mg (for Total mL)" if with_inv else "Total mg (for 0.8 mL)"
+        data = [["ID/Name","MW","Uses","eq","Stock M","µL/well",mass_header,"Total mL"] + (["On hand mL","Action"] if with_inv else [])]
         for r in rows:
             data.append([r.get("id_or_name",""), r.get("mw_g_mol",""), r.get("uses",""), r.get("eq",""),
-                         r.get("stock_M",""), r.get("per_well_uL",""), r.get("total_mass_mg",""), r.get("total_volume_mL","")])
+                         r.get("stock_M",""), r.get("per_well_uL",""), r.get("total_mass_mg",""), r.get("total_volume_mL","")]
+                        + ([r.get("on_hand_mL",""), r.get("action","")] if with_inv else []))
         t = Table(data, repeatRows=1)
         t.setStyle(TableStyle([
             ("BACKGROUND",(0,0),(-1,0), colors.lightgrey),
@@ -104,8 +129,10 @@ def render_stocks_pdf(settings, others, plan):
     table_from_rows("Alkyl bromides", plan["totals"]["alkyl"])
     table_from_rows("Other reagents", plan["totals"]["others"])
 
-    if plan["totals"].get("mixed"):
-        mix = plan["totals"]["mixed"]
+    mixes = plan["totals"].get("mixes")
+    if mixes is None:
+        mixes = [plan["totals"]["mixed"]] if plan["totals"].get("mixed") else []
+    for mix in mixes:
         elems.append(Paragraph(mix["title"], styles["Heading3"]))
         info = [["Per-well (µL)", "Final volume (mL)"], [mix.get("per_well_uL",""), mix.get("total_volume_mL","")]]
         ti = Table(info)
@@ -119,9 +146,13 @@ def render_stocks_pdf(settings, others, plan):
         tc.setStyle(TableStyle([("GRID",(0,0),(-1,-1), 0.25, colors.grey), ("FONTSIZE",(0,0),(-1,-1),9), ("BACKGROUND",(0,0),(-1,0), colors.lightgrey)]))
         elems.append(Spacer(1,6))
         elems.append(tc)
+        elems.append(Spacer(1,6))
 
     elems.append(Spacer(1,8))
     elems.append(Paragraph("Per-well pipetting grids (µL per well), ordered by plate and A1→A6, B1→B6, C1→C6, D1→D6", styles["Heading3"]))
+    transfers = plan["totals"].get("transfers_per_well")
+    if transfers:
+        elems.append(Paragraph("Transfers per well: {} (would be {} without premixes)".format(transfers["premixed"], transfers["separate"]), styles["Normal"]))
 
     for grid in plan["grids"]:
         elems.append(Spacer(1,4))
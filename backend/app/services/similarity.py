@@ -0,0 +1,123 @@
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .loader import DATA_DIR
+
+FP_RADIUS = 2
+FP_BITS = 2048
+FP_CACHE = os.path.join(DATA_DIR, "fingerprints.npz")
+CHUNK = 2000             # molecules per worker task
+PARALLEL_MIN = 4 * CHUNK  # below this, a process pool costs more than it saves
+
+# Set bits per byte value, for popcounts over the packed matrix
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _fingerprint_chunk(smiles: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Packed Morgan fingerprints (n, FP_BITS/8) and a validity mask for a batch of SMILES."""
+    from rdkit import Chem, RDLogger
+    from rdkit.Chem import rdFingerprintGenerator
+    RDLogger.DisableLog("rdApp.*")
+    gen = rdFingerprintGenerator.GetMorganGenerator(radius=FP_RADIUS, fpSize=FP_BITS)
+    bits = np.zeros((len(smiles), FP_BITS // 8), dtype=np.uint8)
+    valid = np.zeros(len(smiles), dtype=bool)
+    for i, smi in enumerate(smiles):
+        mol = Chem.MolFromSmiles(smi) if smi else None
+        if mol is None:
+            continue
+        bits[i] = np.packbits(gen.GetFingerprintAsNumPy(mol).astype(bool))
+        valid[i] = True
+    return bits, valid
+
+def compute_fingerprints(smiles: List[str], workers: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    try:
+        import rdkit  # noqa: F401
+    except ImportError:
+        raise RuntimeError("RDKit is not installed; similarity search is unavailable")
+    if len(smiles) < PARALLEL_MIN or (workers or os.cpu_count() or 1) <= 1:
+        return _fingerprint_chunk(smiles)
+    chunks = [smiles[i:i + CHUNK] for i in range(0, len(smiles), CHUNK)]
+    # Spawn, not fork: this runs from the prewarm thread or a threadpool request
+    # inside a live server (event loop, SQLite handle, other threads).
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parts = list(pool.map(_fingerprint_chunk, chunks))
+    return np.concatenate([b for b, _ in parts]), np.concatenate([v for _, v in parts])
+
+class FingerprintIndex:
+    """
+    Morgan fingerprints of the chemical library as a packed uint8 bit matrix,
+    with Tanimoto top-k search done as one vectorized pass over all rows.
+    """
+    def __init__(self, ids: np.ndarray, types: np.ndarray, smiles: np.ndarray, bits: np.ndarray, valid: np.ndarray):
+        self.ids, self.types, self.smiles = ids, types, smiles
+        self.bits, self.valid = bits, valid
+        self.counts = _POPCOUNT[bits].sum(axis=1, dtype=np.uint16)
+        self._row: Dict[Tuple[str, str], int] = {}
+        for i, (id_, kind) in enumerate(zip(ids.tolist(), types.tolist())):
+            self._row.setdefault((id_, ""), i)
+            self._row.setdefault((id_, kind), i)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def cache_key(ids: List[str], types: List[str], smiles: List[str]) -> str:
+        h = hashlib.sha256(f"morgan r={FP_RADIUS} n={FP_BITS}".encode())
+        for row in zip(ids, types, smiles):
+            h.update("\t".join(row).encode("utf-8") + b"\n")
+        return h.hexdigest()
+
+    @classmethod
+    def load_or_build(cls, ids: List[str], types: List[str], smiles: List[str], cache_path: str = FP_CACHE) -> "FingerprintIndex":
+        key = cls.cache_key(ids, types, smiles)
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path, allow_pickle=False) as z:
+                    if str(z["key"]) == key:
+                        return cls(z["ids"], z["types"], z["smiles"], z["bits"], z["valid"])
+            except Exception as e:
+                print(f"[similarity] Ignoring unreadable cache {cache_path}: {e}")
+
+        t0 = time.perf_counter()
+        bits, valid = compute_fingerprints(smiles)
+        idx = cls(np.array(ids, dtype=str), np.array(types, dtype=str), np.array(smiles, dtype=str), bits, valid)
+        print(f"[similarity] Fingerprinted {len(ids)} chemicals ({int((~valid).sum())} unparsable) in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        try:
+            tmp = cache_path + ".tmp"
+            with open(tmp, "wb") as fh:
+                np.savez(fh, key=np.array(key), ids=idx.ids, types=idx.types, smiles=idx.smiles, bits=bits, valid=valid)
+            os.replace(tmp, cache_path)
+        except OSError as e:
+            print(f"[similarity] Could not write cache {cache_path}: {e}")
+        return idx
+
+    def row_of(self, chem_id: str, kind: Optional[str] = None) -> Optional[int]:
+        return self._row.get((str(chem_id).strip(), (kind or "").strip().lower()))
+
+    def tanimoto(self, row: int) -> np.ndarray:
+        q = self.bits[row]
+        inter = _POPCOUNT[np.bitwise_and(self.bits, q)].sum(axis=1, dtype=np.uint16).astype(np.float32)
+        union = self.counts.astype(np.float32) + float(self.counts[row]) - inter
+        return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+    def similar(self, row: int, k: int = 10, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        sims = self.tanimoto(row)
+        mask = self.valid.copy()
+        mask[row] = False
+        if kind:
+            mask &= self.types == kind.strip().lower()
+        cand = np.flatnonzero(mask)
+        if cand.size == 0 or k <= 0:
+            return []
+        k = min(k, cand.size)
+        top = cand[np.argpartition(-sims[cand], k - 1)[:k]]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [
+            {"id": str(self.ids[i]), "type": str(self.types[i]), "smiles": str(self.smiles[i]), "similarity": round(float(sims[i]), 4)}
+            for i in top
+        ]
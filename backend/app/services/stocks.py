@@ -1,18 +1,29 @@
+import math
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 import pandas as pd
 
-try:
-    from rdkit import Chem
-    from rdkit.Chem import Descriptors
-except Exception:
-    Chem = None
-    Descriptors = None
-
+from .inventory import inventory
 from .loader import data
 
 FINAL_STOCK_VOL_ML = 0.8  # fixed total volume for every stock
 
+# Same defaults the Stock solutions page starts with
+DEFAULT_SETTINGS = {
+    "eq_aryl": 1, "M_aryl": 0.0313,
+    "eq_alkyl": 1.5, "M_alkyl": 0.047,
+    "mmol_limitant_per_well": 0.0005,
+    "overage_pct": 50, "include_controls": False,
+}
+# Reagents that may share one premixed stock (lists of reagent names)
+DEFAULT_PREMIX_GROUPS = [["NiCl2", "dtbbpy"]]
+DEFAULT_OTHER_REAGENTS = [
+    {"name": "TTMSS", "eq": 1.2, "M": 0.0377, "smiles": "C[Si](C)(C)[SiH]([Si](C)(C)C)[Si](C)(C)C"},
+    {"name": "NiCl2", "eq": 0.05, "M": 0.000893, "smiles": ""},
+    {"name": "Ir Cat", "eq": 0.01, "M": 0.000279, "smiles": ""},
+    {"name": "dtbbpy", "eq": 0.06, "M": 0.001397, "smiles": ""},
+]
+
 @dataclass
 class Plan:
     name: str
@@ -23,9 +34,30 @@ class Plan:
     per_well_uL: Optional[float]
     total_mass_mg: Optional[float]
     total_volume_mL: Optional[float]
+    needed_mL: Optional[float] = None
+    on_hand_mL: Optional[float] = None
+    action: str = "prepare"  # prepare | top_up | skip (inventory already covers it)
+
+_rdkit = None
+
+def _rdkit_modules():
+    # RDKit is slow to import; load it on first MW lookup (or via warm())
+    global _rdkit
+    if _rdkit is None:
+        try:
+            from rdkit import Chem
+            from rdkit.Chem import Descriptors
+            _rdkit = (Chem, Descriptors)
+        except Exception:
+            _rdkit = (None, None)
+    return _rdkit
+
+def warm():
+    _rdkit_modules()
 
 def mw_from_smiles(smi: Optional[str]) -> Optional[float]:
     # Robustly ignore None/NaN/'nan' and only attempt parse on real strings
+    Chem, Descriptors = _rdkit_modules()
     if smi is None or Chem is None or Descriptors is None:
         return None
     if isinstance(smi, float):
@@ -36,6 +68,105 @@ def mw_from_smiles(smi: Optional[str]) -> Optional[float]:
     mol = Chem.MolFromSmiles(smi.strip())
     return None if mol is None else float(Descriptors.MolWt(mol))
 
+def _apply_inventory(p: Plan, use_inventory: bool):
+    # Volume the wells draw from this stock; bench stock at the same
+    # concentration is used first, only the shortfall gets prepared.
+    if p.per_well_uL is None or not p.stock_M:
+        return
+    p.needed_mL = round(p.uses * p.per_well_uL / 1000.0, 4)
+    if not use_inventory:
+        return
+    need = p.needed_mL  # size against the value commit_plan will debit
+    have = inventory.remaining_mL(p.name, p.stock_M)
+    p.on_hand_mL = round(have, 4)
+    if have <= 0:
+        p.action, vol = "prepare", max(FINAL_STOCK_VOL_ML, need)
+    elif have >= need:
+        p.action, vol = "skip", 0.0
+    else:
+        p.action, vol = "top_up", max(FINAL_STOCK_VOL_ML - have, need - have)
+    # Round up so a prepared/topped-up stock never falls short of the need
+    p.total_volume_mL = math.ceil(vol * 1000.0 - 1e-9) / 1000.0
+    p.total_mass_mg = None if p.mw is None else round(p.stock_M * p.total_volume_mL / 1000.0 * p.mw * 1000.0, 2)
+
+def _premix_groups(declared, other_list: List[Dict]) -> List[List[Dict]]:
+    """
+    Resolve the declared compatibility groups against the reagent list.
+
+    `declared` is a list of groups, each a list of reagent names or an
+    "A+B+C" string (a bare string is one group); None means
+    DEFAULT_PREMIX_GROUPS. Only declared pairs may
+    be mixed, so a declared name that isn't in the reagent list is an error
+    rather than being dropped from its group. The defaults apply only to the
+    reagents that are present.
+    """
+    strict = declared is not None
+    if declared is None:
+        declared = DEFAULT_PREMIX_GROUPS
+    if isinstance(declared, str):
+        declared = [declared]  # a single "A+B" group
+    if not isinstance(declared, list):
+        raise ValueError("premix_groups must be a list of groups")
+    for grp in declared:
+        if isinstance(grp, str):
+            continue
+        if not isinstance(grp, list) or not all(isinstance(x, str) for x in grp):
+            raise ValueError(f"Premix group {grp!r} must be an 'A+B' string or a list of reagent names")
+    by_name = {_norm(o.get('name', '')): o for o in other_list if o.get('name', '').strip()}
+    seen = set()
+    groups = []
+    for grp in declared:
+        labels = grp.split('+') if isinstance(grp, str) else grp
+        members = []
+        for label in labels:
+            key = _norm(str(label))
+            if not key:
+                continue
+            if key in seen:
+                raise ValueError(f"Reagent '{str(label).strip()}' is in more than one premix group")
+            seen.add(key)
+            if key in by_name:
+                members.append(by_name[key])
+            elif strict:
+                raise ValueError(f"Premix group names unknown reagent '{str(label).strip()}'")
+        if len(members) >= 2:
+            groups.append(members)
+    return groups
+
+def _premix(members: List[Dict], basis_mol: float, mw: Dict[str, Optional[float]]) -> Dict:
+    """
+    One stock dispensing every member in a single transfer. Its per-well volume
+    is the largest of the members' own volumes, so the member that needs the
+    most volume keeps its stock concentration and the others are diluted to
+    deliver the same amount per well.
+    """
+    names = [o['name'].strip() for o in members]
+    vols = []
+    for o in members:
+        eq = float(o.get('eq', 1)); M = float(o.get('M', 0))
+        vols.append((eq * basis_mol / M) * 1e6 if M > 0 else 0.0)
+    V_mix = max(vols) if any(vols) else 0.0
+
+    components = []
+    for o, nm in zip(members, names):
+        eq = float(o.get('eq', 1))
+        C_mix = (eq * basis_mol / (V_mix * 1e-6)) if V_mix > 0 else 0.0
+        mw_c = mw.get(nm)
+        components.append({
+            "name": nm,
+            "mw_g_mol": None if mw_c is None else round(mw_c, 3),
+            "mix_conc_M": round(C_mix, 6) if C_mix else None,
+            "total_mass_mg": None if mw_c is None else round(C_mix * (FINAL_STOCK_VOL_ML/1000.0) * mw_c * 1000.0, 2),
+        })
+
+    return {
+        "title": f"Mixed stock ({' + '.join(names)})",
+        "column": f"uL_MIX({'+'.join(names)})",
+        "per_well_uL": round(V_mix, 2) if V_mix else None,
+        "total_volume_mL": round(FINAL_STOCK_VOL_ML, 2),
+        "components": components,
+    }
+
 def _col(df, name, alts):
     cols = {c.lower(): c for c in df.columns}
     for k in [name.lower(), *[a.lower() for a in alts]]:
@@ -45,16 +176,13 @@ def _col(df, name, alts):
 def _norm(s: str) -> str:
     return ''.join(ch for ch in s.lower() if ch.isalnum())
 
-def _well_sort_key(well: str):
-    if not isinstance(well, str): well = str(well)
-    well = well.strip().upper()
-    rows = {"A":0,"B":1,"C":2,"D":3}
-    r = rows.get(well[:1], 0)
-    try:
-        c = int(well[1:]) - 1
-    except:
-        c = 0
-    return (r, c)
+def _id_counts(s: pd.Series) -> Dict[str, int]:
+    # Wells per ID, in ID order; works on the categorical codes, no per-row strings
+    vc = s.value_counts(dropna=True).sort_index()
+    return {str(k): int(n) for k, n in vc.items() if n > 0}
+
+def _ids_or_blank(s: pd.Series) -> List[str]:
+    return ["" if pd.isna(x) else str(x) for x in s.tolist()]
 
 def stock_plan(day: int, include_next: bool, settings: dict, other_list: List[Dict]):
     df = data.df_reac
@@ -69,7 +197,7 @@ def stock_plan(day: int, include_next: bool, settings: dict, other_list: List[Di
     c_well  = _col(df, "well", ["well position", "well_position", "pos"])
 
     days = [day] + ([day+1] if include_next else [])
-    df_sub = df[df[c_day].isin(days)].copy()
+    df_sub = df[df[c_day].isin(days)]
     if not settings.get('include_controls', False) and c_ctrl:
         df_sub = df_sub[~df_sub[c_ctrl]]
 
@@ -99,16 +227,16 @@ def stock_plan(day: int, include_next: bool, settings: dict, other_list: List[Di
         limiting_kind = "aryl"
 
     # MW maps (for stock mass calculations only)
-    aryl_ids = df_sub[c_aryl].dropna().astype(str).unique().tolist()
-    aryl_mw: Dict[str, Optional[float]] = {aid: mw_from_smiles(data.smiles_for_aryl(aid)) for aid in aryl_ids}
+    aryl_counts = _id_counts(df_sub[c_aryl])
+    aryl_mw: Dict[str, Optional[float]] = {aid: mw_from_smiles(data.smiles_for_aryl(aid)) for aid in aryl_counts}
 
-    alkyl_ids = df_sub[c_alk].dropna().astype(str).unique().tolist()
+    alkyl_counts = _id_counts(df_sub[c_alk])
     def mw_for_alk(alk_id: str) -> Optional[float]:
         mw_over = data.mw_override_for_reagent(alk_id)
         if mw_over is not None: return mw_over
         smi = data.smiles_for_alkyl(alk_id)
         return mw_from_smiles(smi)
-    alkyl_mw: Dict[str, Optional[float]] = {lid: mw_for_alk(lid) for lid in alkyl_ids}
+    alkyl_mw: Dict[str, Optional[float]] = {lid: mw_for_alk(lid) for lid in alkyl_counts}
 
     other_mw: Dict[str, Optional[float]] = {}
     for o in other_list:
@@ -123,9 +251,8 @@ def stock_plan(day: int, include_next: bool, settings: dict, other_list: List[Di
 
     # Aggregate Aryl stocks
     aryl_rows: List[Plan] = []
-    for aid, g in df_sub.groupby(c_aryl, dropna=True):
-        mw = aryl_mw.get(str(aid))
-        uses = int(g.shape[0])
+    for aid, uses in aryl_counts.items():
+        mw = aryl_mw.get(aid)
         per_well_uL = (eqA * basis_mol / M_aryl) * 1e6 if M_aryl > 0 else None
         mass_mg = None if (mw is None) else (M_aryl * FINAL_STOCK_VOL_ML / 1000.0 * mw * 1000.0)
         aryl_rows.append(Plan(
@@ -139,9 +266,8 @@ def stock_plan(day: int, include_next: bool, settings: dict, other_list: List[Di
 
     # Aggregate Alkyl stocks
     alkyl_rows: List[Plan] = []
-    for lid, g in df_sub.groupby(c_alk, dropna=True):
-        mw = alkyl_mw.get(str(lid))
-        uses = int(g.shape[0])
+    for lid, uses in alkyl_counts.items():
+        mw = alkyl_mw.get(lid)
         per_well_uL = (eqL * basis_mol / M_alk) * 1e6 if M_alk > 0 else None
         mass_mg = None if (mw is None) else (M_alk * FINAL_STOCK_VOL_ML / 1000.0 * mw * 1000.0)
         alkyl_rows.append(Plan(
@@ -153,20 +279,14 @@ def stock_plan(day: int, include_next: bool, settings: dict, other_list: List[Di
             total_volume_mL=FINAL_STOCK_VOL_ML
         ))
 
-    # Other reagents (not mixed pair)
+    # Premixes (user-declared compatibility groups, NiCl2 + dtbbpy by default)
+    groups = _premix_groups(settings.get('premix_groups'), other_list)
+    mixes = [_premix(members, basis_mol, other_mw) for members in groups]
+    mixed_names = {_norm(o['name']) for members in groups for o in members}
+
+    # Other reagents (not in a premix)
     other_rows: List[Plan] = []
     n_wells = int(df_sub.shape[0])
-    def find_obj(label: str):
-        for o in other_list:
-            if _norm(o.get('name','')) == _norm(label):
-                return o
-        return None
-    ni = find_obj('NiCl2')
-    bpy = find_obj('dtbbpy')
-    mixed_names = set()
-    if ni and bpy:
-        mixed_names = {_norm('NiCl2'), _norm('dtbbpy')}
-
     for obj in other_list:
         nm = obj.get('name', '').strip()
         if not nm or _norm(nm) in mixed_names:  # handled in mix
@@ -184,43 +304,9 @@ def stock_plan(day: int, include_next: bool, settings: dict, other_list: List[Di
             total_volume_mL=FINAL_STOCK_VOL_ML
         ))
 
-    # Mixed NiCl2 + dtbbpy stock
-    mix = None
-    if ni and bpy:
-        mw_ni = other_mw.get(ni['name'])
-        mw_bp = other_mw.get(bpy['name'])
-        eq_ni = float(ni.get('eq', 1)); M_ni = float(ni.get('M', 0))
-        eq_bp = float(bpy.get('eq', 1)); M_bp = float(bpy.get('M', 0))
-
-        v_ni = (eq_ni * basis_mol / M_ni) * 1e6 if M_ni > 0 else 0.0
-        v_bp = (eq_bp * basis_mol / M_bp) * 1e6 if M_bp > 0 else 0.0
-        V_mix = max(v_ni, v_bp) if (v_ni or v_bp) else 0.0
-
-        C_ni_mix = (eq_ni * basis_mol / (V_mix * 1e-6)) if (V_mix and V_mix > 0) else 0.0
-        C_bp_mix = (eq_bp * basis_mol / (V_mix * 1e-6)) if (V_mix and V_mix > 0) else 0.0
-
-        mass_mg_ni = None if (mw_ni is None) else round(C_ni_mix * (FINAL_STOCK_VOL_ML/1000.0) * mw_ni * 1000.0, 2)
-        mass_mg_bp = None if (mw_bp is None) else round(C_bp_mix * (FINAL_STOCK_VOL_ML/1000.0) * mw_bp * 1000.0, 2)
-
-        mix = {
-            "title": "Mixed stock (NiCl2 + dtbbpy)",
-            "per_well_uL": round(V_mix, 2) if V_mix else None,
-            "total_volume_mL": round(FINAL_STOCK_VOL_ML, 2),
-            "components": [
-                {
-                    "name": ni['name'],
-                    "mw_g_mol": None if mw_ni is None else round(mw_ni,3),
-                    "mix_conc_M": round(C_ni_mix, 6) if C_ni_mix else None,
-                    "total_mass_mg": mass_mg_ni,
-                },
-                {
-                    "name": bpy['name'],
-                    "mw_g_mol": None if mw_bp is None else round(mw_bp,3),
-                    "mix_conc_M": round(C_bp_mix, 6) if C_bp_mix else None,
-                    "total_mass_mg": mass_mg_bp,
-                },
-            ]
-        }
+    use_inventory = bool(settings.get('use_inventory', False))
+    for p in (*aryl_rows, *alkyl_rows, *other_rows):
+        _apply_inventory(p, use_inventory)
 
     def to_dict(p: Plan):
         return {
@@ -232,79 +318,81 @@ def stock_plan(day: int, include_next: bool, settings: dict, other_list: List[Di
             "per_well_uL": p.per_well_uL,
             "total_mass_mg": p.total_mass_mg,
             "total_volume_mL": p.total_volume_mL,
+            "needed_mL": p.needed_mL,
+            "on_hand_mL": p.on_hand_mL,
+            "action": p.action,
         }
 
     totals = {
         "aryl":  [to_dict(x) for x in aryl_rows],
         "alkyl": [to_dict(x) for x in alkyl_rows],
         "others":[to_dict(x) for x in other_rows],
-        "mixed": mix
+        "mixes": mixes,
+        "mixed": mixes[0] if mixes else None,  # single-mix field kept for older clients
+        # Transfers per well (aryl + alkyl + one per stock) with and without premixing
+        "transfers_per_well": {
+            "premixed": 2 + len(other_rows) + len(mixes),
+            "separate": 2 + len(other_rows) + sum(len(members) for members in groups),
+        },
     }
 
     # --- Grids per plate, sorted by well (A1..A6, B1..B6, C1..C6, D1..D6) ---
-    other_names_for_grid = [o['name'] for o in other_list if _norm(o.get('name','')) not in {_norm('NiCl2'), _norm('dtbbpy')}]
-    base_columns = ["well", "aryl_id", "alkyl_id", "limiting_kind", "lim_mmol", "uL_aryl", "uL_alkyl"] + [f"uL_{nm}" for nm in other_names_for_grid]
-    if mix:
-        base_columns.append("uL_MIX(NiCl2+dtbbpy)")
+    other_names_for_grid = [p.name for p in other_rows]
+    mix_columns = [m["column"] for m in mixes]
+    base_columns = ["well", "aryl_id", "alkyl_id", "limiting_kind", "lim_mmol", "uL_aryl", "uL_alkyl"] + [f"uL_{nm}" for nm in other_names_for_grid] + mix_columns
 
-    grids = []
-    for plate_num, g in df_sub.groupby(c_plate):
-        rows = []
-        g_sorted = g.sort_values(by=c_well, key=lambda s: s.map(_well_sort_key))
-        for _, r in g_sorted.iterrows():
-            well = str(r[c_well]) if c_well else ""
-            aid = str(r[c_aryl]) if pd.notna(r[c_aryl]) else ""
-            lid = str(r[c_alk]) if pd.notna(r[c_alk]) else ""
+    # Per-well volumes that don't depend on the well
+    uL_aryl_well  = round((eqA * basis_mol / M_aryl) * 1e6, 2) if M_aryl > 0 else 0.0
+    uL_alkyl_well = round((eqL * basis_mol / M_alk)  * 1e6, 2) if M_alk  > 0 else 0.0
+    other_uL: Dict[str, float] = {}
+    for p in other_rows:
+        other_uL[f"uL_{p.name}"] = p.per_well_uL if p.per_well_uL else 0.0
+    for m in mixes:
+        other_uL[m["column"]] = m["per_well_uL"] if m["per_well_uL"] else 0.0
 
-            uL_aryl  = (eqA * basis_mol / M_aryl) * 1e6 if M_aryl > 0 and aid else 0.0
-            uL_alkyl = (eqL * basis_mol / M_alk)  * 1e6 if M_alk  > 0 and lid else 0.0
+    limiting_label = limiting_kind if limiting_kind != "other" else f"other:{limiting_other_name}"
 
+    # Sort once by plate, then packed well row/col; groupby keeps that order
+    df_sorted = df_sub.sort_values([c_plate, "well_row", "well_col"], kind="stable")
+
+    grids = []
+    for plate_num, g in df_sorted.groupby(c_plate, sort=True):
+        rows = []
+        wells = g[c_well].astype(str).tolist() if c_well else [""] * len(g)
+        for well, aid, lid in zip(wells, _ids_or_blank(g[c_aryl]), _ids_or_blank(g[c_alk])):
             row = {
                 "well": well,
                 "aryl_id": aid,
                 "alkyl_id": lid,
-                "limiting_kind": limiting_kind if limiting_kind != "other" else f"other:{limiting_other_name}",
+                "limiting_kind": limiting_label,
                 "lim_mmol": round(mmol_basis, 6),
-                "uL_aryl": round(uL_aryl, 2) if uL_aryl else 0.0,
-                "uL_alkyl": round(uL_alkyl, 2) if uL_alkyl else 0.0,
+                "uL_aryl": uL_aryl_well if aid else 0.0,
+                "uL_alkyl": uL_alkyl_well if lid else 0.0,
             }
-            for obj in other_list:
-                nm = obj.get('name', '').strip()
-                if not nm or _norm(nm) in {_norm('NiCl2'), _norm('dtbbpy')}:
-                    continue
-                eq = float(obj.get('eq', 1)); M = float(obj.get('M', 0))
-                uL = (eq * basis_mol / M) * 1e6 if M > 0 else 0.0
-                row[f"uL_{nm}"] = round(uL, 2) if uL else 0.0
-
-            if mix:
-                V_mix = totals["mixed"]["per_well_uL"]
-                row["uL_MIX(NiCl2+dtbbpy)"] = V_mix if V_mix else 0.0
-
+            row.update(other_uL)
             rows.append(row)
 
         grids.append({"plate": int(plate_num), "columns": base_columns, "rows": rows})
 
 
     # --- Build summaries by chemical -> plate -> wells (ordered) ---
-    def accumulate_summary(df_slice, id_col):
+    def accumulate_summary(id_col):
         # returns dict: chem_id -> { plate_num: [wells...] }
         out = {}
-        if id_col is None: 
+        if id_col is None:
             return out
-        # sort by plate then well order
-        for plate_num, g in df_sub.groupby(c_plate):
-            g_sorted = g.sort_values(by=c_well, key=lambda s: s.map(_well_sort_key))
-            for _, r in g_sorted.iterrows():
-                chem = r.get(id_col)
-                if pd.isna(chem) or str(chem).strip() == "":
-                    continue
-                well = str(r[c_well])
-                out.setdefault(str(chem), {}).setdefault(int(plate_num), []).append(well)
+        ids = _ids_or_blank(df_sorted[id_col])
+        plates = df_sorted[c_plate].tolist()
+        wells = df_sorted[c_well].astype(str).tolist()
+        for chem, plate_num, well in zip(ids, plates, wells):
+            if chem.strip() == "":
+                continue
+            out.setdefault(chem, {}).setdefault(int(plate_num), []).append(well)
         return out
 
     summaries = {
-        "aryl": accumulate_summary(df_sub, c_aryl),
-        "alkyl": accumulate_summary(df_sub, c_alk),
+        "aryl": accumulate_summary(c_aryl),
+        "alkyl": accumulate_summary(c_alk),
     }
 
     return {"totals": totals, "grids": grids, "summaries": summaries}
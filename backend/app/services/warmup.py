@@ -0,0 +1,25 @@
+import threading
+import time
+
+def prewarm():
+    """Load the heavy optional dependencies ahead of the first request that needs them."""
+    from . import pdf, stocks
+    from .loader import data
+    steps = (
+        ("rdkit", stocks.warm),
+        ("reportlab", pdf.warm),
+        ("fingerprint index", data.fingerprint_index),
+    )
+    for name, warm in steps:
+        t0 = time.perf_counter()
+        try:
+            warm()
+        except Exception as e:
+            print(f"[startup] Pre-warming {name} failed: {e}")
+            continue
+        print(f"[startup] {name} ready in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+def start_prewarm() -> threading.Thread:
+    t = threading.Thread(target=prewarm, name="prewarm", daemon=True)
+    t.start()
+    return t
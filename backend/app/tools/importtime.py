@@ -0,0 +1,101 @@
+"""
+Cold-start import report.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+summarises where the time goes, so we can keep worker boot (and scripts that
+import the package) under a budget.
+
+    python -m app.tools.importtime                       # report for app.main
+    python -m app.tools.importtime --budget-ms 800       # exit 1 if over budget
+    python -m app.tools.importtime --module app.cli --forbid rdkit,reportlab,httpx
+
+Packages listed in --forbid (default: rdkit, reportlab) must not be imported
+at module load; they are meant to be loaded lazily on first use.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_FORBID = "rdkit,reportlab"
+
+class Entry(NamedTuple):
+    name: str
+    level: int
+    self_us: int
+    cumulative_us: int
+
+def parse_importtime(stderr: str) -> List[Entry]:
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        parts = line[len("import time:"):].split("|", 2)
+        if len(parts) != 3:
+            continue
+        # Nesting is encoded as two spaces per level after the "| " separator
+        field = parts[2][1:]
+        name = field.lstrip()
+        out.append(Entry(name, (len(field) - len(name)) // 2, int(parts[0]), int(parts[1])))
+    return out
+
+def measure(module: str) -> Tuple[List[Entry], float]:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr), wall
+
+def module_total_us(entries: List[Entry], module: str) -> int:
+    # Top-level imports belonging to our package; everything they pull in is nested under them
+    root = module.split(".")[0]
+    return sum(e.cumulative_us for e in entries if e.level == 0 and (e.name == root or e.name.startswith(root + ".")))
+
+def by_package(entries: List[Entry]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for e in entries:
+        root = e.name.split(".")[0]
+        out[root] = out.get(root, 0) + e.self_us
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m app.tools.importtime", description="Report cold-start import time.")
+    ap.add_argument("--module", default="app.main", help="Module to import (default app.main)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs to take the fastest of (default 3)")
+    ap.add_argument("--top", type=int, default=15, help="Rows to show per table (default 15)")
+    ap.add_argument("--budget-ms", type=float, default=0, help="Fail if the import takes longer than this")
+    ap.add_argument("--forbid", default=DEFAULT_FORBID, help=f"Packages that must stay lazy (default {DEFAULT_FORBID}; '' for none)")
+    args = ap.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(max(1, args.repeat))]
+    entries, wall = min(runs, key=lambda r: module_total_us(r[0], args.module))
+    total_ms = module_total_us(entries, args.module) / 1000.0
+
+    print(f"import {args.module}: {total_ms:.1f} ms (fastest of {len(runs)}; interpreter wall {wall * 1000:.0f} ms)")
+    print(f"\n{'package':<28}{'self ms':>10}")
+    for pkg, us in sorted(by_package(entries).items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{pkg:<28}{us / 1000.0:>10.1f}")
+    print(f"\n{'module':<48}{'cumulative ms':>14}")
+    for e in sorted(entries, key=lambda e: -e.cumulative_us)[:args.top]:
+        print(f"{e.name:<48}{e.cumulative_us / 1000.0:>14.1f}")
+
+    failed = False
+    imported = {e.name.split(".")[0] for e in entries}
+    leaked = [p.strip() for p in args.forbid.split(",") if p.strip() and p.strip() in imported]
+    if leaked:
+        print(f"\nFAIL: {', '.join(leaked)} imported at load time; keep them lazy")
+        failed = True
+    if args.budget_ms and total_ms > args.budget_ms:
+        print(f"\nFAIL: {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+"""
+Load test for the API.
+
+Replays a weighted mix of plate, stock-plan and PDF requests, with payloads
+built from the loaded data, and reports throughput, latency percentiles and
+error rates per endpoint.
+
+    python -m app.tools.loadtest                                  # in-process (ASGI transport)
+    python -m app.tools.loadtest --url http://127.0.0.1:8000 -c 32 -d 30
+    python -m app.tools.loadtest --mix plate=6,plan=3 --json before.json
+    python -m app.tools.loadtest --json after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from ..services.loader import data, PlateQuery, _col
+from ..services.stocks import DEFAULT_SETTINGS, DEFAULT_OTHER_REAGENTS
+
+ENDPOINTS = {
+    "plate": ("GET", "/api/plate"),
+    "plan": ("POST", "/api/stocks/plan"),
+    "plate_pdf": ("POST", "/api/plate/pdf"),
+    "stocks_pdf": ("POST", "/api/stocks/pdf"),
+}
+DEFAULT_MIX = "plate=6,plan=3,plate_pdf=1,stocks_pdf=1"
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint {name!r} in --mix (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise SystemExit("--mix must give at least one endpoint a positive weight")
+    return mix
+
+class Scenarios:
+    """Realistic request payloads drawn from the (day, plate) pairs in the data."""
+    def __init__(self):
+        df = data.df_reac
+        c_day = _col(df, "day_number", ["day number", "day"])
+        c_plate = _col(df, "plate_in_day", ["plate in day", "plate"])
+        pairs = df[[c_day, c_plate]].drop_duplicates().itertuples(index=False)
+        self.plates: List[Tuple[int, int]] = sorted((int(d), int(p)) for d, p in pairs)
+        self.days: List[int] = sorted({d for d, _ in self.plates})
+        self.grids = {k: data.plate_grid(PlateQuery(day=k[0], plate_in_day=k[1])) for k in self.plates}
+
+    def request(self, kind: str, rng: random.Random) -> Dict[str, Any]:
+        method, path = ENDPOINTS[kind]
+        req: Dict[str, Any] = {"method": method, "url": path}
+        if kind == "plate":
+            d, p = rng.choice(self.plates)
+            req["params"] = {"day": d, "plate": p}
+        elif kind == "plate_pdf":
+            d, p = rng.choice(self.plates)
+            req["json"] = {"title": f"Day {d} - Plate {p}", "grid": self.grids[(d, p)]}
+        else:
+            req["json"] = {
+                "day": rng.choice(self.days),
+                "include_next_day": rng.random() < 0.25,
+                "settings": DEFAULT_SETTINGS,
+                "other_reagents": DEFAULT_OTHER_REAGENTS,
+            }
+        return req
+
+def percentile(sorted_vals: List[float], pct: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    # Nearest-rank percentile
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(pct / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+class Stats:
+    def __init__(self, kinds):
+        self.latencies: Dict[str, List[float]] = {k: [] for k in kinds}
+        self.errors: Dict[str, int] = {k: 0 for k in kinds}
+        self.error_samples: Dict[str, str] = {}
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        rows = {}
+        all_lat: List[float] = []
+        for kind, lat in self.latencies.items():
+            all_lat.extend(lat)
+            rows[kind] = self._row(sorted(lat), self.errors[kind], elapsed)
+        rows["total"] = self._row(sorted(all_lat), sum(self.errors.values()), elapsed)
+        return {"elapsed_s": round(elapsed, 3), "endpoints": rows, "error_samples": self.error_samples}
+
+    @staticmethod
+    def _row(lat: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+        n = len(lat)
+        ms = lambda v: None if v is None else round(v * 1000.0, 2)
+        return {
+            "requests": n,
+            "errors": errors,
+            "error_pct": round(100.0 * errors / n, 2) if n else 0.0,
+            "rps": round(n / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": ms(percentile(lat, 50)),
+            "p95_ms": ms(percentile(lat, 95)),
+            "p99_ms": ms(percentile(lat, 99)),
+            "max_ms": ms(lat[-1] if lat else None),
+        }
+
+async def _worker(client, scenarios, mix, rng, stats, deadline, budget, record):
+    kinds, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        if budget is not None:
+            if budget[0] <= 0:
+                return
+            budget[0] -= 1
+        kind = rng.choices(kinds, weights)[0]
+        req = scenarios.request(kind, rng)
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(**req)
+            ok = r.status_code < 400
+            err = None if ok else f"HTTP {r.status_code}: {r.text[:200]}"
+        except Exception as e:
+            ok, err = False, f"{type(e).__name__}: {e}"
+        dt = time.perf_counter() - t0
+        if not record:
+            continue
+        stats.latencies[kind].append(dt)
+        if not ok:
+            stats.errors[kind] += 1
+            stats.error_samples.setdefault(kind, err)
+
+async def run(args) -> Dict[str, Any]:
+    data.load_all()
+    scenarios = Scenarios()
+    mix = parse_mix(args.mix)
+
+    app = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        from ..main import app
+        # ASGITransport doesn't send lifespan events, so run startup ourselves
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=args.timeout)
+
+    try:
+        async with client:
+            if args.warmup:
+                warm = Stats(mix)
+                await asyncio.gather(*[
+                    _worker(client, scenarios, {k: 1.0}, random.Random(args.seed), warm, float("inf"), [args.warmup], False)
+                    for k in mix
+                ])
+            stats = Stats(mix)
+            budget = [args.requests] if args.requests else None
+            t0 = time.perf_counter()
+            deadline = t0 + args.duration if not args.requests else float("inf")
+            await asyncio.gather(*[
+                _worker(client, scenarios, mix, random.Random(args.seed + i), stats, deadline, budget, True)
+                for i in range(args.concurrency)
+            ])
+            elapsed = time.perf_counter() - t0
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+
+    rep = stats.report(elapsed)
+    rep["config"] = {
+        "target": args.url or "in-process",
+        "concurrency": args.concurrency,
+        "duration_s": None if args.requests else args.duration,
+        "requests": args.requests,
+        "mix": mix,
+        "seed": args.seed,
+    }
+    return rep
+
+def print_report(rep: Dict[str, Any], before: Optional[Dict[str, Any]] = None):
+    cfg = rep["config"]
+    print(f"target={cfg['target']} concurrency={cfg['concurrency']} elapsed={rep['elapsed_s']}s mix={cfg['mix']}")
+    cols = ["requests", "errors", "error_pct", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    print(f"{'endpoint':<12}" + "".join(f"{c:>11}" for c in cols))
+    for kind, row in rep["endpoints"].items():
+        print(f"{kind:<12}" + "".join(f"{'' if row[c] is None else row[c]:>11}" for c in cols))
+        prev = (before or {}).get("endpoints", {}).get(kind)
+        if prev:
+            deltas = []
+            for c in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+                a, b = prev.get(c), row.get(c)
+                deltas.append("" if not a or b is None else f"{100.0 * (b - a) / a:+.1f}%")
+            print(f"{'  vs before':<12}" + f"{'':>11}" * 3 + "".join(f"{d:>11}" for d in deltas))
+    for kind, err in rep.get("error_samples", {}).items():
+        print(f"[{kind}] first error: {err}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m app.tools.loadtest", description="Load test the Lab Plate & Stock API.")
+    ap.add_argument("--url", help="Base URL of a running server (default: drive app.main:app in-process)")
+    ap.add_argument("-c", "--concurrency", type=int, default=16, help="Concurrent simulated users (default 16)")
+    ap.add_argument("-d", "--duration", type=float, default=20.0, help="Test duration in seconds (default 20)")
+    ap.add_argument("-n", "--requests", type=int, default=0, help="Stop after this many requests instead of a duration")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted endpoint mix (default {DEFAULT_MIX})")
+    ap.add_argument("--warmup", type=int, default=2, help="Unrecorded requests per endpoint before measuring (default 2)")
+    ap.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds (default 60)")
+    ap.add_argument("--seed", type=int, default=0, help="Random seed for the request sequence")
+    ap.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    ap.add_argument("--compare", metavar="PATH", help="Previous --json report to show relative changes against")
+    args = ap.parse_args(argv)
+
+    rep = asyncio.run(run(args))
+    before = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            before = json.load(fh)
+    print_report(rep, before)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(rep, fh, indent=2)
+    return 1 if rep["endpoints"]["total"]["errors"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -36,6 +36,16 @@ export async function postStockPlan(payload: any){
   return await r.json();
 }
 
+export async function commitStockPlan(payload: any){
+  const r = await fetch(`${API}/api/inventory/commit`, {
+    method:'POST',
+    headers:{'Content-Type':'application/json'},
+    body: JSON.stringify(payload)
+  });
+  if(!r.ok) throw new Error(await r.text());
+  return await r.json();
+}
+
 export function downloadStockPDF(payload:any){
   return fetch(`${API}/api/stocks/pdf`, {
     method:'POST',
@@ -54,3 +64,24 @@ export function downloadStockPDF(payload:any){
     URL.revokeObjectURL(url);
   })
 }
+
+export type DataEvent = { version:number; sources:string[]; days:number[]; plates:{day:number; plate:number}[] }
+
+// Subscribes to /api/events. `resync` is true when versions were skipped
+// (reconnect or dropped events) and the caller should refetch everything.
+export function subscribeEvents(onData:(ev:DataEvent, resync:boolean)=>void){
+  const es = new EventSource(`${API}/api/events`);
+  let last: number | null = null;
+  es.addEventListener('hello', (e:MessageEvent) => {
+    const v = Number(JSON.parse(e.data).version);
+    if(last !== null && v !== last) onData({version:v, sources:[], days:[], plates:[]}, true);
+    last = v;
+  });
+  es.addEventListener('data', (e:MessageEvent) => {
+    const ev: DataEvent = JSON.parse(e.data);
+    const resync = last !== null && ev.version !== last + 1;
+    last = ev.version;
+    onData(ev, resync);
+  });
+  return () => es.close();
+}
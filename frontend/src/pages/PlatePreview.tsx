@@ -1,6 +1,6 @@
 
-import React, { useEffect, useMemo, useState } from "react";
-import { fetchPlate, downloadPlatePreviewPDF } from "../lib/api";
+import React, { useEffect, useMemo, useRef, useState } from "react";
+import { fetchPlate, downloadPlatePreviewPDF, subscribeEvents } from "../lib/api";
 
 type Cell = { r:number; c:number; label:string; control:boolean };
 
@@ -11,10 +11,11 @@ export default function PlatePreview(){
 
   const title = useMemo(()=>`Day ${day} - Plate ${plate}`, [day, plate]);
 
-  async function load(){
-    const d = parseInt(day || "1") || 1;
-    const p = parseInt(plate || "1") || 1;
+  const loaded = useRef<{day:number; plate:number} | null>(null);
+
+  async function load(d = parseInt(day || "1") || 1, p = parseInt(plate || "1") || 1){
     const res = await fetchPlate(d, p);
+    loaded.current = { day:d, plate:p };
     const grid = res.grid;
     let out: Cell[] = (grid?.cells ?? []).map((c: any) => ({
       r: Number(c.r ?? 0),
@@ -27,6 +28,14 @@ export default function PlatePreview(){
 
   useEffect(()=>{ load(); /* eslint-disable-next-line */ }, []);
 
+  // Refetch only when the plate on screen is among the changed ones
+  useEffect(()=> subscribeEvents((ev, resync)=>{
+    const cur = loaded.current;
+    if(!cur) return;
+    if(resync || ev.plates.some(x => x.day === cur.day && x.plate === cur.plate)) load(cur.day, cur.plate);
+    /* eslint-disable-next-line */
+  }), []);
+
   const matrix: Cell[][] = useMemo(()=>{
     const m: Cell[][] = Array.from({length:4}, (_,r)=>Array.from({length:6},(_,c)=>({r, c, label:"", control:false})));
     for(const cell of cells){
@@ -65,7 +74,7 @@ export default function PlatePreview(){
             <input type="text" inputMode="numeric" pattern="[0-9]*" className="border rounded-md px-2 py-1 w-28 bg-slate-950 border-white/10" value={plate} onChange={e=>setPlate(e.target.value)} />
           </div>
           <div className="flex items-end">
-            <button className="px-3 py-1.5 rounded-md bg-indigo-600 hover:bg-indigo-500 transition text-white" onClick={load}>Load</button>
+            <button className="px-3 py-1.5 rounded-md bg-indigo-600 hover:bg-indigo-500 transition text-white" onClick={()=>load()}>Load</button>
           </div>
           <div className="flex items-end md:col-span-2">
             <button
@@ -1,15 +1,16 @@
 
-import React, { useMemo, useState } from "react";
-import { postStockPlan, downloadStockPDF } from "../lib/api";
+import React, { useEffect, useMemo, useRef, useState } from "react";
+import { postStockPlan, commitStockPlan, downloadStockPDF, subscribeEvents } from "../lib/api";
 
-type PlanTotalsRow = { id_or_name:string; mw_g_mol:number|null; uses:number; eq:number; stock_M:number; per_well_uL:number|null; total_mass_mg:number|null; total_volume_mL:number|null }
+type PlanTotalsRow = { id_or_name:string; mw_g_mol:number|null; uses:number; eq:number; stock_M:number; per_well_uL:number|null; total_mass_mg:number|null; total_volume_mL:number|null; on_hand_mL?:number|null; action?:string }
 type Mix = { title:string; per_well_uL:number|null; total_volume_mL:number|null; components:{name:string; mw_g_mol:number|null; mix_conc_M:number|null; total_mass_mg:number|null}[] }
 
 type PayloadSettings = {
   eq_aryl:number; M_aryl:number;
   eq_alkyl:number; M_alkyl:number;
   mmol_limitant_per_well:number;
-  overage_pct:number; include_controls:boolean
+  overage_pct:number; include_controls:boolean; use_inventory:boolean;
+  premix_groups:string[]
 }
 type Other = { name:string; eq:number; M:number; smiles?:string }
 
@@ -30,6 +31,8 @@ export default function StockSolutions(){
   const [mmolLim, setMmolLim] = useState<string>("0.0005");
   const [over, setOver] = useState<string>("50");
   const [inclCtrl, setInclCtrl] = useState<boolean>(false);
+  const [useInv, setUseInv] = useState<boolean>(false);
+  const [premix, setPremix] = useState<string>('NiCl2+dtbbpy');
 
   const [others, setOthers] = useState<Other[]>([
     { name:'TTMSS', eq:1.2, M:0.0377, smiles:'C[Si](C)(C)[SiH]([Si](C)(C)C)[Si](C)(C)C' },
@@ -49,11 +52,28 @@ export default function StockSolutions(){
       mmol_limitant_per_well: parseNum(mmolLim,0.0005),
       overage_pct: parseNum(over,50),
       include_controls: inclCtrl,
+      use_inventory: useInv,
+      premix_groups: premix.split(';').map(g=>g.trim()).filter(Boolean),
     } as PayloadSettings,
     other_reagents: others
-  }), [day, includeNext, eqA, MA, eqL, ML, mmolLim, over, inclCtrl, others]);
+  }), [day, includeNext, eqA, MA, eqL, ML, mmolLim, over, inclCtrl, useInv, premix, others]);
 
   const [result, setResult] = useState<any | null>(null);
+  const computed = useRef<any | null>(null);
+
+  async function compute(p: any){
+    setResult(await postStockPlan(p));
+    computed.current = p;
+  }
+
+  // Recompute the shown plan only if one of its days changed
+  useEffect(()=> subscribeEvents((ev, resync)=>{
+    const p = computed.current;
+    if(!p) return;
+    const days = p.include_next_day ? [p.day, p.day + 1] : [p.day];
+    if(resync || ev.days.some(d => days.includes(d))) compute(p);
+    /* eslint-disable-next-line */
+  }), []);
 
   return (
     <div className="space-y-4">
@@ -65,6 +85,7 @@ export default function StockSolutions(){
           <input type="text" inputMode="numeric" pattern="[0-9]*" className="border rounded-md px-2 py-1 w-28 bg-slate-950 border-white/10" value={day} onChange={e=>setDay(e.target.value)} />
           <label className="flex items-center gap-2 mt-2 text-sm"><input type="checkbox" checked={includeNext} onChange={e=>setIncludeNext(e.target.checked)} /> Include next day</label>
           <label className="flex items-center gap-2 mt-2 text-sm"><input type="checkbox" checked={inclCtrl} onChange={e=>setInclCtrl(e.target.checked)} /> Include controls</label>
+          <label className="flex items-center gap-2 mt-2 text-sm"><input type="checkbox" checked={useInv} onChange={e=>setUseInv(e.target.checked)} /> Use stocks on the bench</label>
         </div>
 
         <div className="rounded-2xl border border-white/10 bg-slate-900/50 p-4 space-y-2">
@@ -77,7 +98,7 @@ export default function StockSolutions(){
         </div>
 
         <div className="rounded-2xl border border-white/10 bg-slate-900/50 p-4 space-y-2">
-          <div className="font-medium">Stocks (fixed 0.8 mL each)</div>
+          <div className="font-medium">{useInv ? 'Stocks (0.8 mL, more if needed; bench stock used first)' : 'Stocks (fixed 0.8 mL each)'}</div>
           <div className="grid grid-cols-2 gap-2 text-sm">
             <label>Limiting reagent mmol / well</label><input className="border rounded px-2 bg-slate-950 border-white/10" type="text" inputMode="decimal" value={mmolLim} onChange={e=>setMmolLim(e.target.value)} />
             <label>Aryl conc (M)</label><input className="border rounded px-2 bg-slate-950 border-white/10" type="text" inputMode="decimal" value={MA} onChange={e=>setMA(e.target.value)} />
@@ -104,11 +125,16 @@ export default function StockSolutions(){
           </div>
         ))}
         <button className="mt-2 inline-flex items-center gap-2 px-3 py-1.5 rounded-md border border-white/10 hover:border-white/30" onClick={()=>setOthers(arr=>[...arr,{name:'', eq:1, M:0.1, smiles:''}])}>Add reagent</button>
+        <div className="grid grid-cols-12 gap-2 text-sm items-center pt-2">
+          <label className="col-span-3">Premix groups</label>
+          <input className="col-span-9 border rounded px-2 bg-slate-950 border-white/10" placeholder="e.g. NiCl2+dtbbpy; Ir Cat+TTMSS" value={premix} onChange={e=>setPremix(e.target.value)} />
+        </div>
       </div>
 
       <div className="flex gap-2">
-        <button className="inline-flex items-center gap-2 px-3 py-1.5 rounded-md bg-indigo-600 hover:bg-indigo-500 transition text-white" onClick={async ()=>setResult(await postStockPlan(payload))}>Compute plan</button>
+        <button className="inline-flex items-center gap-2 px-3 py-1.5 rounded-md bg-indigo-600 hover:bg-indigo-500 transition text-white" onClick={()=>compute(payload)}>Compute plan</button>
         {result && <button className="inline-flex items-center gap-2 px-3 py-1.5 rounded-md border border-white/10 hover:border-white/30" onClick={()=>downloadStockPDF(payload)}>Download PDF</button>}
+        {result && <button className="inline-flex items-center gap-2 px-3 py-1.5 rounded-md border border-white/10 hover:border-white/30" onClick={async ()=>{ await commitStockPlan(payload); if(useInv) await compute(payload) }}>Commit to inventory</button>}
       </div>
 
       {result && (
@@ -119,7 +145,8 @@ export default function StockSolutions(){
             <PlanTable title="Alkyl bromides" rows={result.totals.alkyl} />
             <PlanTable title="Other reagents" rows={result.totals.others} />
           </div>
-          {result.totals.mixed && <MixedCard mix={result.totals.mixed} />}
+          {(result.totals.mixes ?? (result.totals.mixed ? [result.totals.mixed] : [])).map((m:Mix)=> <MixedCard key={m.title} mix={m} />)}
+          {result.totals.transfers_per_well && <div className="text-sm opacity-80">Transfers per well: {result.totals.transfers_per_well.premixed} (would be {result.totals.transfers_per_well.separate} without premixes)</div>}
 
           <div className="mt-6 space-y-4">
             <SummaryBlock title="Aryl IDs" mapping={result.summaries?.aryl || {}} />
@@ -139,6 +166,7 @@ export default function StockSolutions(){
 }
 
 function PlanTable({title, rows}:{title:string; rows:PlanTotalsRow[]}){
+  const withInv = rows.some(r => r.on_hand_mL != null);
   return (
     <div className="rounded-2xl border border-white/10 bg-slate-900/50 p-3">
       <div className="font-medium mb-2">{title}</div>
@@ -146,7 +174,7 @@ function PlanTable({title, rows}:{title:string; rows:PlanTotalsRow[]}){
         <table className="w-full text-sm">
           <thead>
             <tr className="bg-white/5">
-              {['ID/Name','MW','Uses','eq','Stock M','\u03BCL / well','Total mg (for 0.8 mL)','Total mL'].map(h=> <th key={h} className="p-1 text-left">{h}</th>)}
+              {['ID/Name','MW','Uses','eq','Stock M','\u03BCL / well',withInv ? 'Total mg (for Total mL)' : 'Total mg (for 0.8 mL)','Total mL', ...(withInv ? ['On hand mL','Action'] : [])].map(h=> <th key={h} className="p-1 text-left">{h}</th>)}
             </tr>
           </thead>
           <tbody>
@@ -160,6 +188,8 @@ function PlanTable({title, rows}:{title:string; rows:PlanTotalsRow[]}){
                 <td className="p-1">{r.per_well_uL ?? ''}</td>
                 <td className="p-1">{r.total_mass_mg ?? ''}</td>
                 <td className="p-1">{r.total_volume_mL ?? ''}</td>
+                {withInv && <td className="p-1">{r.on_hand_mL ?? ''}</td>}
+                {withInv && <td className="p-1">{r.action ?? ''}</td>}
               </tr>
             ))}
           </tbody>